@@ -4,7 +4,8 @@ query_handler.py - Orchestrates the full NL → SQL → Execute → Log pipeline
 This is the single entry point called by the UI.
 """
 from __future__ import annotations
-from core.nl_to_sql import convert_to_sql
+from typing import Iterator
+from core.nl_to_sql import convert_to_sql, convert_to_sql_stream, remember_sql
 from core.sql_validator import validate_sql
 from core.query_executor import execute_query
 from core.logger import log_query
@@ -23,13 +24,49 @@ def handle_query(user_question: str) -> dict:
         "can_answer": bool,                  # False if schema can't answer the question
         "validation_passed": bool,
         "validation_error": str | None,
-        "rows": list[dict],
+        "rows_soa": list[tuple],            # row tuples, ordered as `columns`
         "columns": list[str],
         "row_count": int,
         "execution_time_ms": float | None,
         "error": str | None,                # user-facing error message
     }
     """
+    return _complete(user_question, convert_to_sql(user_question))
+
+
+def handle_query_stream(user_question: str) -> Iterator[str | dict]:
+    """
+    Same pipeline as handle_query, but yields the generated SQL text chunk
+    by chunk while the model writes it, then the final result dict (same
+    shape as handle_query's) once validation and execution are done.
+    """
+    nl_result: dict | None = None
+    for item in convert_to_sql_stream(user_question):
+        if isinstance(item, dict):
+            nl_result = item
+        else:
+            yield item
+    yield _complete(user_question, nl_result)
+
+
+def log_reused_result(user_question: str, result: dict) -> None:
+    """
+    Audit a question answered with a result computed for another request
+    (a cache hit, or a run already in flight), so every question is still
+    logged. Nothing was executed for it, hence an execution time of 0.
+    """
+    log_query(
+        user_question=user_question,
+        generated_sql=result.get("generated_sql"),
+        validation_passed=result.get("validation_passed", False),
+        execution_time_ms=0.0 if result.get("validation_passed") else None,
+        row_count=result.get("row_count") if result.get("validation_passed") else None,
+        error_message=result.get("validation_error") or result.get("error"),
+    )
+
+
+def _complete(user_question: str, nl_result: dict) -> dict:
+    """Validate, execute and log the SQL from a convert_to_sql result."""
     result: dict = {
         "success": False,
         "user_question": user_question,
@@ -38,7 +75,7 @@ def handle_query(user_question: str) -> dict:
         "can_answer": True,
         "validation_passed": False,
         "validation_error": None,
-        "rows": [],
+        "rows_soa": [],
         "columns": [],
         "row_count": 0,
         "execution_time_ms": None,
@@ -46,8 +83,6 @@ def handle_query(user_question: str) -> dict:
     }
 
     # ── Step 1: NL → SQL ─────────────────────────────────────────────────
-    nl_result = convert_to_sql(user_question)
-
     if nl_result["error"]:
         result["error"] = nl_result["error"]
         log_query(
@@ -93,13 +128,16 @@ def handle_query(user_question: str) -> dict:
 
     # ── Step 3: Execute ──────────────────────────────────────────────────
     exec_result = execute_query(validation.sql)
-    result["rows"] = exec_result["rows"]
+    result["rows_soa"] = exec_result["rows_soa"]
     result["columns"] = exec_result["columns"]
     result["row_count"] = exec_result["row_count"]
     result["execution_time_ms"] = exec_result["execution_time_ms"]
 
     if exec_result["success"]:
         result["success"] = True
+        # Only SQL that validated and ran is reused for similar questions
+        if not nl_result.get("cached"):
+            remember_sql(user_question, nl_result["sql"])
     else:
         result["error"] = exec_result["error"]
 
@@ -14,6 +14,7 @@ class Settings:
     DB_NAME: str     = os.getenv("DB_NAME", "")
     DB_USER: str     = os.getenv("DB_USER", "")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
+    WARM_POOL: bool  = os.getenv("WARM_POOL", "1") == "1"   # open pool at import, off the request path
 
     # ── Ollama (local LLM) ────────────────────────────────────
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -23,6 +24,9 @@ class Settings:
     MAX_ROWS: int        = int(os.getenv("MAX_ROWS", 500))
     QUERY_TIMEOUT: int   = int(os.getenv("QUERY_TIMEOUT", 30))   # seconds
 
+    # ── Caching ───────────────────────────────────────────────
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", 1024))
+
     # ── Tables the AI must never touch ────────────────────────
     RESTRICTED_TABLES: set = {"query_logs", "users", "secrets", "passwords", "api_keys"}
 
@@ -1,6 +1,7 @@
 """
 database.py - Thread-safe PostgreSQL connection pool.
 """
+import threading
 import psycopg2
 from psycopg2 import pool
 from contextlib import contextmanager
@@ -8,26 +9,48 @@ from core.config import settings
 
 
 _pool: pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
 
 
 def get_pool() -> pool.ThreadedConnectionPool:
     """Lazily create the connection pool (singleton)."""
     global _pool
-    if _pool is None or _pool.closed:
-        _pool = pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            dbname=settings.DB_NAME,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            connect_timeout=10,
-            options=f"-c statement_timeout={settings.QUERY_TIMEOUT * 1000}",  # ms
-        )
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = _create_pool()
     return _pool
 
 
+def _create_pool() -> pool.ThreadedConnectionPool:
+    return pool.ThreadedConnectionPool(
+        minconn=2,                     # covers concurrent first requests
+        maxconn=10,
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        dbname=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        connect_timeout=10,
+        options=f"-c statement_timeout={settings.QUERY_TIMEOUT * 1000}",  # ms
+    )
+
+
+def _warm_pool() -> None:
+    global _warmup_error
+    try:
+        get_pool()
+    except Exception as e:
+        _warmup_error = str(e)  # reported once by health(); later requests retry
+
+
+# Open the pool in the background so the first question doesn't pay for it
+_warmup_thread: threading.Thread | None = None
+_warmup_error: str | None = None
+if settings.WARM_POOL:
+    _warmup_thread = threading.Thread(target=_warm_pool, name="db-pool-warmup", daemon=True)
+    _warmup_thread.start()
+
+
 @contextmanager
 def get_connection():
     """Context manager that yields a connection and returns it to the pool."""
@@ -52,3 +75,22 @@ def test_connection() -> tuple[bool, str]:
         return True, "Connected successfully"
     except Exception as e:
         return False, str(e)
+
+
+def health(timeout: float | None = None) -> tuple[bool, str]:
+    """
+    Wait for the background pool warm-up to finish, then check connectivity.
+    If the warm-up has just failed, its error is returned as-is rather than
+    paying for a second connect attempt.
+    """
+    global _warmup_thread, _warmup_error
+    thread = _warmup_thread
+    if thread is not None:
+        thread.join(timeout)
+        if thread.is_alive():
+            return False, "Still connecting to the database..."
+        _warmup_thread = None
+        error, _warmup_error = _warmup_error, None
+        if error is not None:
+            return False, error
+    return test_connection()
@@ -1,16 +1,22 @@
 from __future__ import annotations
-import re
+import csv
 import io
+import re
 import pandas as pd
-import psycopg2.extras
+import pyarrow.csv as pacsv
 from core.database import get_connection
+from core import result_cache
+from core.schema_inspector import invalidate_schema_cache
+from core.semantic_cache import sql_cache
+
+
+# Runs of anything that isn't a lowercase letter or digit (incl. underscores)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
 
 
 def _sanitise_name(name: str) -> str:
-    name = name.lower().strip()
-    name = re.sub(r"[^a-z0-9_]", "_", name)
-    name = re.sub(r"_+", "_", name)
-    name = name.strip("_")
+    # One scan: each run of non-alphanumerics (incl. underscores) becomes "_"
+    name = _NON_ALNUM.sub("_", name.lower().strip()).strip("_")
     if not name or name[0].isdigit():
         name = "tbl_" + name
     return name[:60]
@@ -28,31 +34,46 @@ def _pg_type(dtype) -> str:
 
 def _clean_df(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna(how="all")
-    df.columns = [_sanitise_name(str(c)) for c in df.columns]
-    seen: dict[str, int] = {}
-    new_cols = []
-    for c in df.columns:
-        if c in seen:
-            seen[c] += 1
-            new_cols.append(f"{c}_{seen[c]}")
-        else:
-            seen[c] = 0
-            new_cols.append(c)
-    df.columns = new_cols
+    # Same rules as _sanitise_name, applied to every column name at once
+    cols = (
+        pd.Series(df.columns.astype(str))
+        .str.lower()
+        .str.replace(_NON_ALNUM, "_", regex=True)
+        .str.strip("_")
+    )
+    cols = cols.where(~cols.str.match(r"\d|$"), "tbl_" + cols).str[:60]
+    # De-duplicate: repeats get _1, _2, ... in order of appearance
+    dup_n = cols.groupby(cols).cumcount()
+    cols = cols.where(dup_n.eq(0), cols + "_" + dup_n.astype(str))
+    df.columns = pd.Index(cols)
     return df
 
 
+def _detect_delimiter(uploaded_file) -> str:
+    """Sniff the delimiter from the first 64 KB, then rewind the file."""
+    sample = uploaded_file.read(65536).decode("utf-8", errors="ignore")
+    uploaded_file.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",\t;|").delimiter
+    except csv.Error:
+        return "\t" if sample.count("\t") > sample.count(",") else ","
+
+
 def read_uploaded_file(uploaded_file) -> tuple[pd.DataFrame, str]:
     name = uploaded_file.name.lower()
     try:
         if name.endswith(".csv") or name.endswith(".txt"):
-            raw = uploaded_file.read()
-            try:
-                df = pd.read_csv(io.BytesIO(raw), sep=",", on_bad_lines="skip")
-                if df.shape[1] == 1:
-                    df = pd.read_csv(io.BytesIO(raw), sep="\t", on_bad_lines="skip")
-            except Exception:
-                df = pd.read_csv(io.BytesIO(raw), sep="\t", on_bad_lines="skip")
+            sep = _detect_delimiter(uploaded_file)
+            # PyArrow pulls the stream block by block and parses multithreaded
+            # in C++; bad rows are skipped like before
+            table = pacsv.read_csv(
+                uploaded_file,
+                parse_options=pacsv.ParseOptions(delimiter=sep, invalid_row_handler=lambda row: "skip"),
+                convert_options=pacsv.ConvertOptions(strings_can_be_null=True),
+            )
+            # Release Arrow buffers column by column while converting
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
         elif name.endswith(".xlsx") or name.endswith(".xls"):
             df = pd.read_excel(uploaded_file, engine="openpyxl" if name.endswith("xlsx") else "xlrd")
         else:
@@ -72,10 +93,12 @@ def import_dataframe_to_db(df: pd.DataFrame, table_name: str, if_exists: str = "
     col_defs = ",\n    ".join(f'"{col}" {_pg_type(df[col].dtype)}' for col in df.columns)
     create_sql = f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n    {col_defs}\n);'
     drop_sql   = f'DROP TABLE IF EXISTS "{table_name}";'
-    placeholders = ", ".join(["%s"] * len(df.columns))
     col_names    = ", ".join(f'"{c}"' for c in df.columns)
-    insert_sql   = f'INSERT INTO "{table_name}" ({col_names}) VALUES ({placeholders})'
-    rows = [tuple(None if pd.isna(v) else v for v in row) for row in df.itertuples(index=False, name=None)]
+    copy_sql     = f'COPY "{table_name}" ({col_names}) FROM STDIN WITH (FORMAT CSV, NULL \'\')'
+    # NaN/NaT are written as empty fields, which COPY loads as NULL
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep="")
+    buf.seek(0)
 
     try:
         with get_connection() as conn:
@@ -83,7 +106,10 @@ def import_dataframe_to_db(df: pd.DataFrame, table_name: str, if_exists: str = "
                 if if_exists == "replace":
                     cur.execute(drop_sql)
                 cur.execute(create_sql)
-                psycopg2.extras.execute_batch(cur, insert_sql, rows, page_size=500)
-        return True, f"✅ Imported {len(rows):,} rows into table `{table_name}`."
+                cur.copy_expert(copy_sql, buf)
+        result_cache.invalidate()
+        sql_cache.clear()
+        invalidate_schema_cache()
+        return True, f"✅ Imported {len(df):,} rows into table `{table_name}`."
     except Exception as e:
         return False, f"Import failed: {str(e)}"
\ No newline at end of file
@@ -1,10 +1,71 @@
 """
 logger.py - Stores every query attempt in the query_logs audit table.
-Uses a separate connection to avoid interfering with read-only sessions.
+
+log_query only enqueues the record; a background daemon thread drains the
+queue and writes entries in batches through the shared connection pool, so
+the audit insert never sits on the response path. Entries still queued when
+the process is killed are lost (at-most-once); flush_logs() runs at normal
+interpreter exit.
 """
 from __future__ import annotations
-import psycopg2
-from core.config import settings
+import atexit
+import queue
+import threading
+import psycopg2.extras
+from core.database import get_connection
+
+
+_BATCH_SIZE = 100
+
+_INSERT_SQL = """
+    INSERT INTO query_logs
+        (user_question, generated_sql, validation_passed,
+         execution_time_ms, row_count, error_message)
+    VALUES %s
+"""
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_write_lock = threading.Lock()
+
+
+def _drain(first: tuple | None = None) -> list[tuple]:
+    """Pull up to _BATCH_SIZE queued records without blocking."""
+    batch = [] if first is None else [first]
+    while len(batch) < _BATCH_SIZE:
+        try:
+            batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(batch: list[tuple]) -> None:
+    if not batch:
+        return
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, _INSERT_SQL, batch)
+    except Exception:
+        pass  # Logging must never crash the app
+
+
+def _consumer() -> None:
+    while True:
+        first = _log_queue.get()
+        with _write_lock:
+            _write(_drain(first))
+
+
+def flush_logs() -> None:
+    """Synchronously write every record still waiting in the queue."""
+    with _write_lock:
+        while batch := _drain():
+            _write(batch)
+
+
+threading.Thread(target=_consumer, name="query-log-writer", daemon=True).start()
+atexit.register(flush_logs)
 
 
 def log_query(
@@ -17,36 +78,15 @@ def log_query(
     error_message: str | None = None,
 ) -> None:
     """
-    Insert an audit record into query_logs.
-    Silently swallows errors so logging never crashes the main pipeline.
+    Queue an audit record for query_logs and return immediately.
+    Write failures are swallowed by the writer thread so logging never
+    crashes the main pipeline.
     """
-    try:
-        conn = psycopg2.connect(
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            dbname=settings.DB_NAME,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            connect_timeout=5,
-        )
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO query_logs
-                        (user_question, generated_sql, validation_passed,
-                         execution_time_ms, row_count, error_message)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        user_question,
-                        generated_sql,
-                        validation_passed,
-                        execution_time_ms,
-                        row_count,
-                        error_message,
-                    ),
-                )
-        conn.close()
-    except Exception:
-        pass  # Logging must never crash the app
+    _log_queue.put((
+        user_question,
+        generated_sql,
+        validation_passed,
+        execution_time_ms,
+        row_count,
+        error_message,
+    ))
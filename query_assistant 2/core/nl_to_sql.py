@@ -3,13 +3,32 @@ nl_to_sql.py - Converts natural language questions into PostgreSQL
 SELECT queries using a local Ollama model (e.g. llama3, codellama, mistral).
 """
 from __future__ import annotations
+import functools
+import json
 import re
+from typing import Iterator
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from core.config import settings
 from core.schema_inspector import get_schema_context
+from core.semantic_cache import embed, sql_cache
 
 
-_SYSTEM_PROMPT = """You are an expert PostgreSQL query generator for a business intelligence system.
+# Markdown code fences (```sql ... ```) some models wrap their answer in
+_FENCE_RE = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE | re.MULTILINE)
+
+# Numbers in a question ("top 5" vs "top 10") barely move its embedding
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Keep-alive session so each question reuses a pooled connection to Ollama
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=0))
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+_SYSTEM_PROMPT_TEMPLATE = """You are an expert PostgreSQL query generator for a business intelligence system.
 
 Your ONLY job is to convert natural language questions into valid PostgreSQL SELECT queries.
 
@@ -26,57 +45,76 @@ STRICT RULES:
 {schema}"""
 
 
-def convert_to_sql(question: str) -> dict:
-    """
-    Convert a natural language question to a SQL query via Ollama.
+@functools.lru_cache(maxsize=1)
+def _full_system_prompt(schema: str) -> str:
+    """System prompt with the schema filled in, re-rendered only when the schema changes."""
+    return _SYSTEM_PROMPT_TEMPLATE.format(schema=schema)
 
-    Returns:
-        {
-            "sql": str | None,
-            "can_answer": bool,
-            "error": str | None,
-        }
+
+# Model whose SQL is currently in sql_cache; another model's answers are dropped
+_cache_model: str | None = None
+
+
+def _cached_sql(question: str, embedding) -> str | None:
+    """SQL previously answered (and run successfully) for a near-identical question."""
+    global _cache_model
+    if _cache_model != settings.OLLAMA_MODEL:
+        sql_cache.clear()
+        _cache_model = settings.OLLAMA_MODEL
+    if embedding is None:
+        return None
+    hit = sql_cache.lookup(embedding)
+    if hit is None:
+        return None
+    cached_question, sql = hit
+    if _NUMBER_RE.findall(cached_question) != _NUMBER_RE.findall(question):
+        return None
+    return sql
+
+
+def remember_sql(question: str, sql: str) -> None:
     """
-    schema_context = get_schema_context()
-    system = _SYSTEM_PROMPT.format(schema=schema_context)
+    Add a translation to the semantic cache. Called by the pipeline only once
+    the SQL has passed validation and executed successfully.
+    """
+    if _cache_model != settings.OLLAMA_MODEL:
+        return   # model switched mid-question; the SQL is from the old one
+    embedding = embed(question)
+    if embedding is not None:
+        sql_cache.add(embedding, question, sql)
+
 
-    payload = {
+def _payload(question: str, stream: bool) -> dict:
+    return {
         "model": settings.OLLAMA_MODEL,
-        "system": system,
+        "system": _full_system_prompt(get_schema_context()),
         "prompt": question,
-        "stream": False,
+        "stream": stream,
         "options": {
             "temperature": 0,        # deterministic — critical for SQL
             "num_predict": 1024,
         },
     }
 
-    try:
-        response = requests.post(
-            f"{settings.OLLAMA_BASE_URL}/api/generate",
-            json=payload,
-            timeout=120,             # local models can be slow on first call
-        )
-        response.raise_for_status()
-        data = response.json()
-        raw: str = data.get("response", "").strip()
 
-        # Strip accidental markdown code fences that some models add
-        raw = re.sub(r"^```(?:sql)?", "", raw, flags=re.IGNORECASE).strip()
-        raw = re.sub(r"```$", "", raw).strip()
-        # Remove any leading/trailing blank lines
-        raw = "\n".join(line for line in raw.splitlines() if line.strip())
+def _finish(text: str) -> dict:
+    """Turn the model's full answer into the convert_to_sql result."""
+    # Strip accidental markdown code fences that some models add
+    raw = _FENCE_RE.sub("", text).strip()
 
-        if not raw:
-            return {"sql": None, "can_answer": False,
-                    "error": "The model returned an empty response. Try rephrasing your question."}
+    if not raw:
+        return {"sql": None, "can_answer": False,
+                "error": "The model returned an empty response. Try rephrasing your question."}
+
+    if raw.upper().strip() == "CANNOT_ANSWER":
+        return {"sql": None, "can_answer": False, "error": None}
 
-        if raw.upper().strip() == "CANNOT_ANSWER":
-            return {"sql": None, "can_answer": False, "error": None}
+    return {"sql": raw, "can_answer": True, "error": None, "cached": False}
 
-        return {"sql": raw, "can_answer": True, "error": None}
 
-    except requests.exceptions.ConnectionError:
+def _request_error(e: Exception) -> dict:
+    """Map a failed Ollama call to a user-facing convert_to_sql result."""
+    if isinstance(e, requests.exceptions.ConnectionError):
         return {
             "sql": None,
             "can_answer": False,
@@ -85,10 +123,10 @@ def convert_to_sql(question: str) -> dict:
                 "Make sure Ollama is running: `ollama serve`"
             ),
         }
-    except requests.exceptions.Timeout:
+    if isinstance(e, requests.exceptions.Timeout):
         return {"sql": None, "can_answer": False,
                 "error": "Ollama request timed out. The model may still be loading — try again."}
-    except requests.exceptions.HTTPError as e:
+    if isinstance(e, requests.exceptions.HTTPError):
         if e.response.status_code == 404:
             return {
                 "sql": None,
@@ -99,5 +137,74 @@ def convert_to_sql(question: str) -> dict:
                 ),
             }
         return {"sql": None, "can_answer": False, "error": f"Ollama HTTP error: {e}"}
+    return {"sql": None, "can_answer": False, "error": f"AI error: {str(e)}"}
+
+
+def convert_to_sql(question: str) -> dict:
+    """
+    Convert a natural language question to a SQL query via Ollama.
+
+    Returns:
+        {
+            "sql": str | None,
+            "can_answer": bool,
+            "error": str | None,
+            "cached": bool,          # True if served from the semantic cache
+        }
+
+    Questions semantically close to one answered before reuse the cached
+    SQL without calling the model.
+    """
+    cached_sql = _cached_sql(question, embed(question))
+    if cached_sql is not None:
+        return {"sql": cached_sql, "can_answer": True, "error": None, "cached": True}
+
+    try:
+        response = _session.post(
+            f"{settings.OLLAMA_BASE_URL}/api/generate",
+            json=_payload(question, stream=False),
+            timeout=120,             # local models can be slow on first call
+        )
+        response.raise_for_status()
+        return _finish(response.json().get("response", ""))
+    except Exception as e:
+        return _request_error(e)
+
+
+def convert_to_sql_stream(question: str) -> Iterator[str | dict]:
+    """
+    Streaming variant of convert_to_sql: yields the model's text chunks as
+    they arrive, then exactly one final dict shaped like convert_to_sql's
+    return value. A semantic cache hit yields the whole SQL as one chunk.
+    """
+    cached_sql = _cached_sql(question, embed(question))
+    if cached_sql is not None:
+        yield cached_sql
+        yield {"sql": cached_sql, "can_answer": True, "error": None, "cached": True}
+        return
+
+    parts: list[str] = []
+    try:
+        with _session.post(
+            f"{settings.OLLAMA_BASE_URL}/api/generate",
+            json=_payload(question, stream=True),
+            timeout=120,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            # Ollama streams one JSON object per line until "done"
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if token:
+                    parts.append(token)
+                    yield token
+                if chunk.get("done"):
+                    break
     except Exception as e:
-        return {"sql": None, "can_answer": False, "error": f"AI error: {str(e)}"}
+        yield _request_error(e)
+        return
+
+    yield _finish("".join(parts))
@@ -4,7 +4,12 @@ query_executor.py - Executes validated SQL queries and returns structured result
 from __future__ import annotations
 import time
 import psycopg2
+from core.config import settings
 from core.database import get_connection
+from core import result_cache
+
+
+_FETCH_BATCH_SIZE = 500
 
 
 def execute_query(sql: str) -> dict:
@@ -14,41 +19,64 @@ def execute_query(sql: str) -> dict:
     Returns:
         {
             "success": bool,
-            "rows": list[dict],
+            "rows_soa": list[tuple],   # one tuple per row, ordered as `columns`
             "columns": list[str],
             "row_count": int,
             "execution_time_ms": float,
             "error": str | None,
         }
+
+    At most settings.MAX_ROWS rows are fetched, whatever LIMIT the SQL has.
+    Successful results are cached by SQL text for a short TTL; cache hits
+    report an execution time of 0.
     """
+    cached = result_cache.get_cached(sql)
+    if cached is not None:
+        return cached
+
     start = time.perf_counter()
 
     try:
         with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SET TRANSACTION READ ONLY")
+            # Server-side (named) cursor: rows arrive in batches of `itersize`
+            # instead of via one big fetchall().
+            with conn.cursor(name="qa_stream") as cur:
+                cur.itersize = _FETCH_BATCH_SIZE
                 cur.execute(sql)
+                # Hard cap at MAX_ROWS: the validator's LIMIT check can be
+                # satisfied by a LIMIT inside a CTE or subquery
+                max_rows = settings.MAX_ROWS
+                batch = cur.fetchmany(min(cur.itersize, max_rows))
+                # Named cursors only expose a description after the first fetch
                 columns = [desc[0] for desc in cur.description] if cur.description else []
-                rows_raw = cur.fetchall()
+                rows: list[tuple] = []
+                while batch:
+                    rows.extend(batch)
+                    remaining = max_rows - len(rows)
+                    if remaining <= 0:
+                        break
+                    batch = cur.fetchmany(min(cur.itersize, remaining))
 
         elapsed_ms = (time.perf_counter() - start) * 1000
 
-        rows = [dict(zip(columns, row)) for row in rows_raw]
-
-        return {
+        result = {
             "success": True,
-            "rows": rows,
+            "rows_soa": rows,
             "columns": columns,
             "row_count": len(rows),
             "execution_time_ms": round(elapsed_ms, 2),
             "error": None,
         }
+        result_cache.store(sql, result)
+        return result
 
     except psycopg2.errors.QueryCanceled:
         elapsed_ms = (time.perf_counter() - start) * 1000
         return {
             "success": False,
-            "rows": [],
+            "rows_soa": [],
             "columns": [],
             "row_count": 0,
             "execution_time_ms": round(elapsed_ms, 2),
@@ -58,7 +86,7 @@ def execute_query(sql: str) -> dict:
         elapsed_ms = (time.perf_counter() - start) * 1000
         return {
             "success": False,
-            "rows": [],
+            "rows_soa": [],
             "columns": [],
             "row_count": 0,
             "execution_time_ms": round(elapsed_ms, 2),
@@ -68,7 +96,7 @@ def execute_query(sql: str) -> dict:
         elapsed_ms = (time.perf_counter() - start) * 1000
         return {
             "success": False,
-            "rows": [],
+            "rows_soa": [],
             "columns": [],
             "row_count": 0,
             "execution_time_ms": round(elapsed_ms, 2),
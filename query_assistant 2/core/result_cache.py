@@ -0,0 +1,42 @@
+"""
+result_cache.py - In-process TTL cache of query results keyed by the exact SQL.
+
+Repeated or retried questions usually produce identical SQL; serving those
+from memory skips the database round trip entirely.
+"""
+from __future__ import annotations
+import hashlib
+import threading
+from cachetools import TTLCache
+
+
+_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+_lock = threading.RLock()
+
+
+def _key(sql: str) -> bytes:
+    normalized = sql.strip().rstrip(";").rstrip()
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+
+def get_cached(sql: str) -> dict | None:
+    """Return a shallow copy of the cached result for this SQL, or None."""
+    with _lock:
+        hit = _cache.get(_key(sql))
+    if hit is None:
+        return None
+    result = dict(hit)
+    result["execution_time_ms"] = 0.0
+    return result
+
+
+def store(sql: str, result: dict) -> None:
+    """Cache a successful execution result."""
+    with _lock:
+        _cache[_key(sql)] = dict(result)
+
+
+def invalidate() -> None:
+    """Drop every cached result (call after any data change)."""
+    with _lock:
+        _cache.clear()
@@ -3,55 +3,106 @@ schema_inspector.py - Reads the live PostgreSQL schema so the AI
 only generates queries against real tables and columns.
 """
 from __future__ import annotations
-import functools
+import threading
+import time
 from core.database import get_connection
 from core.config import settings
 
 
-@functools.lru_cache(maxsize=1)
+# Cheap fingerprint of the public tables' columns: changes whenever a table
+# is created, dropped/recreated or renamed, or a column is added, dropped,
+# renamed, retyped, or has its nullability or comment changed. Dropped
+# columns stay in pg_attribute (attisdropped), so the flag is hashed too.
+_FINGERPRINT_QUERY = """
+    SELECT md5(string_agg(
+        c.oid::text || ':' || c.relname || ':' || a.attnum::text || ':' || a.attname
+            || ':' || a.atttypid::text || ':' || a.atttypmod::text
+            || ':' || a.attnotnull::text || ':' || a.attisdropped::text
+            || ':' || coalesce(pg_catalog.col_description(c.oid, a.attnum), ''),
+        ',' ORDER BY c.oid, a.attnum))
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = c.oid
+    WHERE c.relkind = 'r'
+      AND c.relnamespace = 'public'::regnamespace
+      AND a.attnum > 0;
+"""
+
+# How long a cached schema is trusted before re-checking the fingerprint
+_SCHEMA_CHECK_INTERVAL = 5.0   # seconds
+
+_schema_cache: dict = {"version": None, "text": None, "checked_at": 0.0}
+_schema_lock = threading.Lock()
+
+
+def invalidate_schema_cache() -> None:
+    """Force the next get_schema_context() call to rebuild from the DB."""
+    with _schema_lock:
+        _schema_cache["version"] = None
+
+
 def get_schema_context() -> str:
     """
     Returns a compact, human-readable description of every non-restricted
     table in the database, including column names, types, and nullable flag.
 
-    Result is cached for the lifetime of the process (restart to refresh).
+    The text is cached and only rebuilt when the catalog fingerprint changes
+    (checked at most every few seconds) or after invalidate_schema_cache().
     """
+    with _schema_lock:
+        now = time.monotonic()
+        if (
+            _schema_cache["version"] is not None
+            and now - _schema_cache["checked_at"] < _SCHEMA_CHECK_INTERVAL
+        ):
+            return _schema_cache["text"]
+
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_FINGERPRINT_QUERY)
+                version = cur.fetchone()[0] or ""
+
+        if version != _schema_cache["version"]:
+            _schema_cache["text"] = _build_schema_context()
+            _schema_cache["version"] = version
+        _schema_cache["checked_at"] = now
+        return _schema_cache["text"]
+
+
+def _build_schema_context() -> str:
+    """Query the catalog and render the schema description."""
     schema: dict[str, list[dict]] = {}
 
+    # Read the catalogs directly: information_schema views expand into many
+    # joins and privilege checks. Restricted tables are filtered server-side.
     query = """
         SELECT
-            c.table_name,
-            c.column_name,
-            c.data_type,
-            c.is_nullable,
-            c.column_default,
-            pgd.description AS column_comment
-        FROM information_schema.columns c
-        JOIN information_schema.tables t
-            ON c.table_name = t.table_name
-           AND c.table_schema = t.table_schema
-        LEFT JOIN pg_catalog.pg_statio_all_tables st
-            ON st.relname = c.table_name
-        LEFT JOIN pg_catalog.pg_description pgd
-            ON pgd.objoid = st.relid
-           AND pgd.objsubid = c.ordinal_position
-        WHERE c.table_schema = 'public'
-          AND t.table_type = 'BASE TABLE'
-        ORDER BY c.table_name, c.ordinal_position;
+            c.relname,
+            a.attname,
+            pg_catalog.format_type(a.atttypid, a.atttypmod),
+            NOT a.attnotnull,
+            pg_catalog.col_description(c.oid, a.attnum)
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_attribute a
+            ON a.attrelid = c.oid
+        WHERE c.relkind = 'r'
+          AND c.relnamespace = 'public'::regnamespace
+          AND c.relname <> ALL(%s::text[])
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+        ORDER BY c.relname, a.attnum;
     """
 
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(query)
+            cur.execute(query, (sorted(settings.RESTRICTED_TABLES),))
             rows = cur.fetchall()
 
-    for table_name, col_name, data_type, nullable, default, comment in rows:
-        if table_name in settings.RESTRICTED_TABLES:
-            continue
+    for table_name, col_name, data_type, nullable, comment in rows:
         schema.setdefault(table_name, []).append({
             "column": col_name,
             "type": data_type,
-            "nullable": nullable == "YES",
+            "nullable": nullable,
         })
 
     if not schema:
@@ -69,14 +120,22 @@ def get_schema_context() -> str:
 
 
 def get_table_names() -> list[str]:
-    """Returns list of accessible table names."""
+    """
+    Returns list of accessible table names. Uses the same pg_class filter as
+    the schema context, so the sidebar lists exactly the tables the model sees.
+    """
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT table_name FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-                """
+                SELECT c.relname
+                FROM pg_catalog.pg_class c
+                WHERE c.relkind = 'r'
+                  AND c.relnamespace = 'public'::regnamespace
+                  AND c.relname <> ALL(%s::text[])
+                ORDER BY c.relname;
+                """,
+                (sorted(settings.RESTRICTED_TABLES),),
             )
             rows = cur.fetchall()
-    return [r[0] for r in rows if r[0] not in settings.RESTRICTED_TABLES]
+    return [r[0] for r in rows]
@@ -0,0 +1,155 @@
+"""
+semantic_cache.py - Embedding-based cache of question → SQL translations.
+
+Rephrased but equivalent questions ("leads in Texas" / "Texas leads") map to
+the same SQL, so a close-enough embedding match lets us skip the LLM call.
+Embeddings come from a small local ONNX model via fastembed; if the model
+can't be loaded the cache simply stays disabled.
+"""
+from __future__ import annotations
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+from core.config import settings
+
+
+_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+_EMBEDDING_DIM = 384
+_SIMILARITY_THRESHOLD = 0.95
+
+# Random-projection LSH: only worth it once a full scan gets expensive
+_LSH_BITS = 16
+_LSH_MIN_ENTRIES = 2000
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embedder():
+    """Load the embedding model once; returns None if unavailable."""
+    try:
+        from fastembed import TextEmbedding
+        return TextEmbedding(model_name=_MODEL_NAME)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def embed(text: str) -> np.ndarray | None:
+    """
+    Return the L2-normalised embedding of `text`, or None if embedding is unavailable.
+    Memoised, since a question is embedded for the lookup and again when its
+    SQL is stored; callers must not modify the returned array.
+    """
+    embedder = _get_embedder()
+    if embedder is None:
+        return None
+    try:
+        vec = np.asarray(next(iter(embedder.embed([text]))), dtype=np.float32)
+    except Exception:
+        return None
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else None
+
+
+class SemanticCache:
+    """
+    Fixed-capacity store of (question, sql) pairs indexed by their embeddings.
+
+    Embeddings live in a preallocated (max_entries, dim) matrix so a lookup is
+    a single matrix-vector product; vectors are pre-normalised, making the dot
+    product the cosine similarity. When full, the least recently used slot is
+    overwritten.
+
+    Every slot is also bucketed by a 16-bit random-projection hash. With
+    `lsh=True` (or by default once the cache holds more than 2000 entries)
+    lookups only score the query's bucket plus its 16 one-bit neighbours
+    instead of the whole matrix.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        threshold: float = _SIMILARITY_THRESHOLD,
+        dim: int = _EMBEDDING_DIM,
+        lsh: bool | None = None,
+    ):
+        self.threshold = threshold
+        self.lsh = lsh                # None → enable automatically when large
+        self.matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self.entries: list[tuple[str, str] | None] = [None] * max_entries
+        self._lru: OrderedDict[int, None] = OrderedDict()   # slot index, oldest first
+        self._lock = threading.Lock()
+
+        rng = np.random.default_rng(0)
+        self._planes = rng.standard_normal((dim, _LSH_BITS)).astype(np.float32)
+        self._bit_weights = np.uint64(1) << np.arange(_LSH_BITS, dtype=np.uint64)
+        self._slot_hash = np.zeros(max_entries, dtype=np.uint64)
+        self._buckets: dict[int, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _hash(self, embedding: np.ndarray) -> int:
+        bits = (embedding @ self._planes) > 0
+        return int(self._bit_weights[bits].sum())
+
+    def _lsh_enabled(self) -> bool:
+        if self.lsh is not None:
+            return self.lsh
+        return len(self._lru) > _LSH_MIN_ENTRIES
+
+    def _candidates(self, embedding: np.ndarray) -> np.ndarray:
+        """Slots in the query's bucket and every bucket one bit-flip away."""
+        h = self._hash(embedding)
+        slots: list[int] = list(self._buckets.get(h, ()))
+        for bit in range(_LSH_BITS):
+            slots.extend(self._buckets.get(h ^ (1 << bit), ()))
+        return np.asarray(slots, dtype=np.intp)
+
+    def lookup(self, embedding: np.ndarray) -> tuple[str, str] | None:
+        """Return (question, sql) for the most similar question above threshold."""
+        with self._lock:
+            size = len(self._lru)
+            if not size:
+                return None
+            if self._lsh_enabled():
+                slots = self._candidates(embedding)
+                if not slots.size:
+                    return None
+                sims = self.matrix[slots] @ embedding
+            else:
+                slots = None
+                sims = self.matrix[:size] @ embedding
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            if slots is not None:
+                best = int(slots[best])
+            self._lru.move_to_end(best)
+            return self.entries[best]
+
+    def add(self, embedding: np.ndarray, question: str, sql: str) -> None:
+        """Store a translation, evicting the least recently used entry if full."""
+        with self._lock:
+            if len(self._lru) < len(self.entries):
+                slot = len(self._lru)
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self._buckets[int(self._slot_hash[slot])].remove(slot)
+            h = self._hash(embedding)
+            self.matrix[slot] = embedding
+            self.entries[slot] = (question, sql)
+            self._slot_hash[slot] = h
+            self._buckets.setdefault(h, []).append(slot)
+            self._lru[slot] = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.matrix[:] = 0
+            self.entries = [None] * len(self.entries)
+            self._lru.clear()
+            self._slot_hash[:] = 0
+            self._buckets.clear()
+
+
+sql_cache = SemanticCache(max_entries=settings.SEMANTIC_CACHE_SIZE)
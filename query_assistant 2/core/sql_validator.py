@@ -7,6 +7,7 @@ Validates that the generated SQL is:
   3. Under the row limit (injects LIMIT if missing)
 """
 from __future__ import annotations
+import functools
 import re
 import sqlparse
 from sqlparse.sql import Statement
@@ -14,17 +15,27 @@ from sqlparse.tokens import Keyword, DDL, DML
 from core.config import settings
 
 
-# ── Dangerous keyword patterns ─────────────────────────────────────────────
-_DANGEROUS_PATTERN = re.compile(
-    r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|TRUNCATE|CREATE|REPLACE|"
-    r"GRANT|REVOKE|EXEC|EXECUTE|CALL|COPY|LOAD|IMPORT|EXPORT|"
-    r"pg_read_file|pg_write_file|lo_import|lo_export|DBLINK)\b",
+# ── Forbidden-word scanner ─────────────────────────────────────────────────
+# Dangerous keywords and restricted table names share one alternation so the
+# SQL is scanned once; the named group tells us which kind of word matched.
+_DANGEROUS_KEYWORDS = (
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE", "REPLACE",
+    "GRANT", "REVOKE", "EXEC", "EXECUTE", "CALL", "COPY", "LOAD", "IMPORT", "EXPORT",
+    "pg_read_file", "pg_write_file", "lo_import", "lo_export", "DBLINK",
+)
+_FORBIDDEN_PATTERN = re.compile(
+    r"\b(?:(?P<danger>" + "|".join(_DANGEROUS_KEYWORDS) + r")"
+    r"|(?P<restricted>" + "|".join(re.escape(t) for t in sorted(settings.RESTRICTED_TABLES)) + r"))\b",
     re.IGNORECASE,
 )
 
 # Match any attempt to start a second statement after a semicolon
 _MULTI_STATEMENT_PATTERN = re.compile(r";.+", re.DOTALL)
 
+# Leading SELECT/WITH keyword. Deliberately no comment skipping: Postgres
+# block comments nest, so anything starting with a comment goes to sqlparse.
+_SELECT_START = re.compile(r"\A\s*(SELECT|WITH)\b", re.IGNORECASE)
+
 # Detect LIMIT clause already present
 _LIMIT_PATTERN = re.compile(r"\bLIMIT\s+\d+\b", re.IGNORECASE)
 
@@ -43,7 +54,23 @@ def validate_sql(sql: str) -> ValidationResult:
     """
     Full safety validation pipeline.
     Returns a ValidationResult with the (possibly modified) safe SQL or a reason for rejection.
+
+    Results are memoised per SQL string, so repeated SQL (e.g. from the
+    semantic cache) is validated once.
     """
+    valid, safe_sql, reason = _validate_cached(sql)
+    return ValidationResult(valid, sql=safe_sql, reason=reason)
+
+
+# Depends on settings.RESTRICTED_TABLES / MAX_ROWS, which are fixed at startup;
+# call _validate_cached.cache_clear() if they are ever changed at runtime.
+@functools.lru_cache(maxsize=1024)
+def _validate_cached(sql: str) -> tuple[bool, str | None, str | None]:
+    result = _validate(sql)
+    return result.valid, result.sql, result.reason
+
+
+def _validate(sql: str) -> ValidationResult:
     sql = sql.strip()
 
     # ── 1. Basic non-empty check ───────────────────────────────────────────
@@ -51,11 +78,20 @@ def validate_sql(sql: str) -> ValidationResult:
         return ValidationResult(False, reason="Empty query received.")
 
     # ── 2. Dangerous keyword scan ──────────────────────────────────────────
-    match = _DANGEROUS_PATTERN.search(sql)
-    if match:
+    # Single pass collecting the first hit of each kind; restricted tables
+    # are reported later (step 5) to keep the original check order.
+    danger = restricted = None
+    for match in _FORBIDDEN_PATTERN.finditer(sql):
+        if match.lastgroup == "danger":
+            danger = match.group()
+            break
+        if restricted is None:
+            restricted = match.group().lower()
+
+    if danger:
         return ValidationResult(
             False,
-            reason=f"Forbidden keyword detected: '{match.group()}'. Only SELECT queries are allowed."
+            reason=f"Forbidden keyword detected: '{danger}'. Only SELECT queries are allowed."
         )
 
     # ── 3. Multi-statement prevention ─────────────────────────────────────
@@ -67,43 +103,51 @@ def validate_sql(sql: str) -> ValidationResult:
             reason="Multiple SQL statements detected. Only a single SELECT is allowed."
         )
 
-    # ── 4. Parse with sqlparse and verify first token is SELECT ───────────
-    try:
-        statements = sqlparse.parse(cleaned)
-    except Exception:
-        return ValidationResult(False, reason="SQL parsing failed.")
-
-    if not statements or not statements[0].tokens:
-        return ValidationResult(False, reason="Could not parse SQL statement.")
-
-    stmt: Statement = statements[0]
-    first_meaningful = next(
-        (t for t in stmt.tokens if not t.is_whitespace), None
-    )
-
-    if first_meaningful is None or first_meaningful.ttype not in (DML,):
-        # Fallback: check raw string starts with SELECT
-        if not cleaned.upper().lstrip().startswith("SELECT"):
-            return ValidationResult(
-                False,
-                reason="Only SELECT queries are permitted."
-            )
-    else:
-        if first_meaningful.normalized.upper() != "SELECT":
-            return ValidationResult(
-                False,
-                reason=f"Query must start with SELECT. Got: '{first_meaningful.normalized}'."
+    # ── 4. Verify the statement is a SELECT ───────────────────────────────
+    # Fast path: a statement that literally starts with SELECT needs no parse.
+    head = _SELECT_START.match(cleaned)
+    head_keyword = head.group(1).upper() if head else None
+
+    if head_keyword != "SELECT":
+        try:
+            statements = sqlparse.parse(cleaned)
+        except Exception:
+            return ValidationResult(False, reason="SQL parsing failed.")
+
+        if not statements or not statements[0].tokens:
+            return ValidationResult(False, reason="Could not parse SQL statement.")
+
+        stmt: Statement = statements[0]
+
+        if head_keyword == "WITH":
+            # CTE: sqlparse reports the type of the statement after the WITH list
+            if stmt.get_type() != "SELECT":
+                return ValidationResult(
+                    False,
+                    reason="Only SELECT queries are permitted."
+                )
+        else:
+            first_meaningful = next(
+                (t for t in stmt.tokens if not t.is_whitespace), None
             )
 
+            if first_meaningful is None or first_meaningful.ttype not in (DML,):
+                return ValidationResult(
+                    False,
+                    reason="Only SELECT queries are permitted."
+                )
+            if first_meaningful.normalized.upper() != "SELECT":
+                return ValidationResult(
+                    False,
+                    reason=f"Query must start with SELECT. Got: '{first_meaningful.normalized}'."
+                )
+
     # ── 5. Restricted table check ──────────────────────────────────────────
-    sql_upper = cleaned.upper()
-    for restricted in settings.RESTRICTED_TABLES:
-        # Match whole word to avoid partial matches
-        if re.search(rf"\b{restricted.upper()}\b", sql_upper):
-            return ValidationResult(
-                False,
-                reason=f"Access to restricted table '{restricted}' is not allowed."
-            )
+    if restricted:
+        return ValidationResult(
+            False,
+            reason=f"Access to restricted table '{restricted}' is not allowed."
+        )
 
     # ── 6. Inject LIMIT if missing ─────────────────────────────────────────
     if not _LIMIT_PATTERN.search(cleaned):
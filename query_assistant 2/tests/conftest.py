@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Make project root importable regardless of CWD
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from core import nl_to_sql
+from core.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def sql_cache(monkeypatch):
+    cache = SemanticCache(max_entries=8, dim=4)
+    monkeypatch.setattr(nl_to_sql, "sql_cache", cache)
+    monkeypatch.setattr(nl_to_sql, "_cache_model", nl_to_sql.settings.OLLAMA_MODEL)
+    return cache
+
+
+def _vec() -> np.ndarray:
+    return np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+
+
+def test_cached_sql_hit(sql_cache):
+    sql_cache.add(_vec(), "top 5 leads by value", "SELECT 5")
+    assert nl_to_sql._cached_sql("top 5 leads by deal value", _vec()) == "SELECT 5"
+
+
+def test_cached_sql_numbers_must_match(sql_cache):
+    # Same embedding, different literal: must not reuse the other question's SQL
+    sql_cache.add(_vec(), "top 5 leads", "SELECT 5")
+    assert nl_to_sql._cached_sql("top 10 leads", _vec()) is None
+
+
+def test_cached_sql_dropped_on_model_change(sql_cache, monkeypatch):
+    sql_cache.add(_vec(), "top 5 leads", "SELECT 5")
+    monkeypatch.setattr(nl_to_sql.settings, "OLLAMA_MODEL", "another-model")
+    assert nl_to_sql._cached_sql("top 5 leads", _vec()) is None
+    assert len(sql_cache) == 0
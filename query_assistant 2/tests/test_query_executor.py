@@ -0,0 +1,43 @@
+import contextlib
+
+from core import query_executor
+from core.config import settings
+
+
+class _FakeCursor:
+    def __init__(self, total_rows: int):
+        self.left = total_rows
+        self.description = None
+        self.itersize = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.description = [("id",)]
+
+    def fetchmany(self, size):
+        n = min(size, self.left)
+        self.left -= n
+        return [(1,)] * n
+
+
+class _FakeConnection:
+    def cursor(self, name=None):
+        return _FakeCursor(settings.MAX_ROWS * 3)
+
+
+def test_fetch_is_capped_at_max_rows(monkeypatch):
+    monkeypatch.setattr(
+        query_executor, "get_connection",
+        contextlib.contextmanager(lambda: (yield _FakeConnection())),
+    )
+    # The only LIMIT is inside the CTE, so the validator lets it through
+    result = query_executor.execute_query(
+        "WITH t AS (SELECT * FROM leads LIMIT 5) SELECT * FROM leads, t"
+    )
+    assert result["success"]
+    assert result["row_count"] == settings.MAX_ROWS
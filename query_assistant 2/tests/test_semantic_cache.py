@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from core.semantic_cache import SemanticCache
+
+DIM = 32
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    return (v / np.linalg.norm(v)).astype(np.float32)
+
+
+def _basis(i: int) -> np.ndarray:
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+@pytest.fixture(params=[False, True], ids=["scan", "lsh"])
+def cache(request):
+    return SemanticCache(max_entries=3, dim=DIM, lsh=request.param)
+
+
+def test_exact_hit(cache):
+    cache.add(_basis(0), "q0", "SELECT 0")
+    assert cache.lookup(_basis(0)) == ("q0", "SELECT 0")
+
+
+def test_near_hit_and_far_miss(cache):
+    rng = np.random.default_rng(1)
+    base = _unit(rng.standard_normal(DIM))
+    cache.add(base, "q", "SELECT 1")
+    assert cache.lookup(_unit(base + 0.01 * rng.standard_normal(DIM))) == ("q", "SELECT 1")
+    assert cache.lookup(_unit(rng.standard_normal(DIM))) is None
+
+
+def test_evicts_least_recently_used(cache):
+    for i in range(3):
+        cache.add(_basis(i), f"q{i}", f"SELECT {i}")
+    cache.lookup(_basis(0))                     # q1 is now the oldest
+    cache.add(_basis(3), "q3", "SELECT 3")
+    assert len(cache) == 3
+    assert cache.lookup(_basis(1)) is None
+    assert cache.lookup(_basis(0)) == ("q0", "SELECT 0")
+    assert cache.lookup(_basis(3)) == ("q3", "SELECT 3")
+    # Evicted slot left its old LSH bucket
+    assert sum(len(slots) for slots in cache._buckets.values()) == 3
+
+
+def test_clear(cache):
+    cache.add(_basis(0), "q0", "SELECT 0")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.lookup(_basis(0)) is None
+
+
+def test_lsh_matches_full_scan():
+    rng = np.random.default_rng(2)
+    scan = SemanticCache(max_entries=64, dim=DIM, lsh=False)
+    lsh = SemanticCache(max_entries=64, dim=DIM, lsh=True)
+    vectors = [_unit(rng.standard_normal(DIM)) for _ in range(64)]
+    for i, v in enumerate(vectors):
+        scan.add(v, f"q{i}", f"SELECT {i}")
+        lsh.add(v, f"q{i}", f"SELECT {i}")
+    for v in vectors:
+        assert lsh.lookup(v) == scan.lookup(v)
@@ -0,0 +1,26 @@
+import pytest
+
+from core.config import settings
+from core.sql_validator import validate_sql
+
+
+@pytest.mark.parametrize("sql", [
+    # Postgres block comments nest: everything up to the last */ is comment
+    "/* /* */ SELECT LIMIT 1 */ SET statement_timeout = 0",
+    "/* /* */ SELECT */ VACUUM",
+    "/* /* */ SELECT */ NOTIFY ch",
+])
+def test_nested_comment_hides_non_select(sql):
+    result = validate_sql(sql)
+    assert not result.valid
+    assert result.reason == "Only SELECT queries are permitted."
+
+
+def test_plain_select_gets_limit():
+    result = validate_sql("SELECT id FROM leads")
+    assert result.valid
+    assert result.sql.endswith(f"LIMIT {settings.MAX_ROWS}")
+
+
+def test_cte_select_allowed():
+    assert validate_sql("WITH t AS (SELECT 1 AS x) SELECT x FROM t").valid
@@ -4,20 +4,25 @@ app.py - Streamlit chatbot UI for the Intelligent Data Query Assistant.
 Run with:  streamlit run ui/app.py
 """
 from __future__ import annotations
+import functools
+import html
 import sys
 import os
+import threading
+import time
+import uuid
+from typing import Iterator
 
 # Make project root importable regardless of CWD
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-import pandas as pd
 import streamlit as st
+from cachetools import TTLCache
 
-from api.query_handler import handle_query
-from core.database import test_connection
+from api.query_handler import handle_query_stream, log_reused_result
+from core.config import settings
+from core.database import health
 from core.schema_inspector import get_table_names
-from core.schema_inspector import get_table_names
-from core.file_importer import read_uploaded_file, import_dataframe_to_db
 
 # ── Page config ───────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -121,6 +126,187 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# ── Cached helpers ────────────────────────────────────────────────────────────
+# pandas (and the file importer, which pulls in pandas + pyarrow) are only
+# imported on first use so the first paint doesn't pay for them.
+@functools.lru_cache(maxsize=1)
+def _pd():
+    import pandas
+    return pandas
+
+
+@st.cache_resource
+def _http_session():
+    """Keep-alive HTTP session shared across reruns and sessions."""
+    import requests as _req
+    session = _req.Session()
+    adapter = _req.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _fetch_ollama_models(base_url: str) -> list[str]:
+    """Names of the models pulled into Ollama; reused for 30s across clicks/reruns."""
+    r = _http_session().get(f"{base_url}/api/tags", timeout=3)
+    return [m["name"] for m in r.json().get("models", [])]
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_table_names() -> list[str]:
+    """Sidebar table list; one DB round trip per minute instead of per rerun."""
+    return get_table_names()
+
+
+def _unique_columns(columns: list[str]) -> list[str]:
+    """Suffix repeated names (id, id_1, ...) without clashing with real columns."""
+    taken = set(columns)
+    out: list[str] = []
+    used: set[str] = set()
+    for name in columns:
+        unique, n = name, 0
+        while unique in used or (n and unique in taken):
+            n += 1
+            unique = f"{name}_{n}"
+        used.add(unique)
+        out.append(unique)
+    return out
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _result_df(msg_id: str, _meta: dict) -> "pd.DataFrame":
+    """
+    Result frame for one assistant message, built once per message id.
+    The meta arg is underscore-prefixed so Streamlit doesn't hash it.
+    """
+    pd = _pd()
+    # st.dataframe (via pyarrow) rejects duplicate names, e.g. from
+    # SELECT a.id, b.id, so repeats become id_1, id_2, ...
+    columns = _unique_columns(_meta["columns"])
+    if "data" in _meta:
+        # Columnar: one list per column, matched to `columns` by position
+        df = pd.DataFrame(dict(enumerate(_meta["data"])), copy=False)
+        df.columns = columns
+    else:
+        df = pd.DataFrame.from_records(_meta["rows_soa"], columns=columns)
+    # Convert any non-serialisable types to string, all object columns at once
+    obj_cols = df.select_dtypes(include="object").columns
+    if len(obj_cols):
+        try:
+            df[obj_cols] = df[obj_cols].astype(str)
+        except Exception:
+            pass
+    return df
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def _cached_test_connection() -> tuple[bool, str]:
+    """
+    DB probe; repeated clicks within 15s reuse the last answer. Waits for the
+    background pool warm-up first, so a new session doesn't race it.
+    """
+    return health(timeout=15)
+
+
+class _PipelineRun:
+    """
+    One handle_query_stream run on a worker thread. Any number of sessions
+    can follow it, each replaying the SQL chunks from the start.
+    """
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.result: dict | None = None
+        self._cond = threading.Condition()
+
+    def run(self, question: str) -> None:
+        result = None
+        try:
+            for item in handle_query_stream(question):
+                if isinstance(item, dict):
+                    result = item
+                else:
+                    with self._cond:
+                        self.chunks.append(item)
+                        self._cond.notify_all()
+        except Exception as e:
+            result = {"success": False, "error": f"Unexpected error: {e}"}
+        with self._cond:
+            self.result = result or {"success": False, "error": "No result from the pipeline."}
+            self._cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Yield SQL chunks (including those already produced) until the run finishes."""
+        seen = 0
+        while True:
+            with self._cond:
+                while len(self.chunks) == seen and self.result is None:
+                    self._cond.wait()
+                new, finished = self.chunks[seen:], self.result is not None
+            seen += len(new)
+            yield from new
+            if finished:
+                return
+
+
+@st.cache_resource
+def _answers() -> tuple[TTLCache, dict[tuple[str, str], _PipelineRun], threading.Lock]:
+    """
+    Process-wide pipeline results plus the runs currently in flight, both
+    keyed on (active model, lower-cased whitespace-collapsed question).
+    Results live in memory only: rows are business data.
+    """
+    return TTLCache(maxsize=128, ttl=300), {}, threading.Lock()
+
+
+def _run_and_store(run: _PipelineRun, question: str, key: tuple[str, str]) -> None:
+    cache, inflight, lock = _answers()
+    run.run(question)
+    with lock:
+        if run.result.get("success"):
+            cache[key] = run.result
+        inflight.pop(key, None)
+
+
+def _answer(question: str) -> dict:
+    """
+    Cached result for the question, or else the result of the run already
+    answering it (double-clicks, several users), or of a new run. While a
+    run is in flight its SQL is shown as the model writes it.
+
+    Only a new run goes through handle_query's audit logging, so cache hits
+    and followers of another run are logged here.
+    """
+    cache, inflight, lock = _answers()
+    key = (settings.OLLAMA_MODEL, " ".join(question.lower().split()))
+    started = False
+    with lock:
+        result = cache.get(key)
+        run = inflight.get(key) if result is None else None
+        if result is None and run is None:
+            started = True
+            run = inflight[key] = _PipelineRun()
+            # Own thread, not the script's: an interrupted rerun doesn't abort it
+            threading.Thread(
+                target=_run_and_store, args=(run, question, key), name="query", daemon=True,
+            ).start()
+
+    if result is not None:
+        log_reused_result(question, result)
+        return result
+
+    placeholder = st.empty()
+    sql_so_far = ""
+    for chunk in run.follow():
+        sql_so_far += chunk
+        placeholder.code(sql_so_far, language="sql")
+    placeholder.empty()
+    if not started:
+        log_reused_result(question, run.result)
+    return run.result
+
+
 # ── Session state ─────────────────────────────────────────────────────────────
 if "messages" not in st.session_state:
     st.session_state.messages = []   # list of dicts: {role, content, meta}
@@ -128,6 +314,18 @@ if "db_ok" not in st.session_state:
     st.session_state.db_ok = None
 
 
+def _check_ollama() -> None:
+    """Probe Ollama; on success also index the model list for the picker."""
+    try:
+        models = _fetch_ollama_models(settings.OLLAMA_BASE_URL)
+    except Exception as e:
+        st.session_state["ollama_ok"] = (False, str(e))
+        return
+    st.session_state["ollama_ok"] = (True, models)
+    # Model → position, built once per fetch rather than on every render
+    st.session_state["_ollama_idx"] = {m: i for i, m in enumerate(models)}
+
+
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 with st.sidebar:
     st.markdown("## 🤖 Query Assistant")
@@ -145,6 +343,8 @@ with st.sidebar:
     )
 
     if uploaded_file:
+        from core.file_importer import read_uploaded_file, import_dataframe_to_db
+
         with st.spinner("Reading file..."):
             df_preview, read_err = read_uploaded_file(uploaded_file)
 
@@ -171,12 +371,11 @@ with st.sidebar:
                         table_name,
                         if_exists="replace" if mode == "Replace it" else "append",
                     )
-                    try:
-                        from core.schema_inspector import get_schema_context
-                        get_schema_context.cache_clear()
-                    except Exception:
-                        pass
                 if ok:
+                    _cached_table_names.clear()
+                    answers, _, answers_lock = _answers()
+                    with answers_lock:
+                        answers.clear()
                     st.success(msg)
                     st.rerun()
                 else:
@@ -190,18 +389,11 @@ with st.sidebar:
     col_a, col_b = st.columns(2)
     with col_a:
         if st.button("Check Ollama", use_container_width=True):
-            try:
-                import requests as _req
-                from core.config import settings as _s
-                r = _req.get(f"{_s.OLLAMA_BASE_URL}/api/tags", timeout=3)
-                models = [m["name"] for m in r.json().get("models", [])]
-                st.session_state["ollama_ok"] = (True, models)
-            except Exception as e:
-                st.session_state["ollama_ok"] = (False, str(e))
+            _check_ollama()
 
     with col_b:
         if st.button("Test DB", use_container_width=True):
-            ok, msg = test_connection()
+            ok, msg = _cached_test_connection()
             st.session_state.db_ok = (ok, msg)
 
     if "ollama_ok" in st.session_state:
@@ -209,17 +401,19 @@ with st.sidebar:
         if ok:
             st.success(f"✅ Ollama running")
             if payload:
-                from core.config import settings as _s
-                current = _s.OLLAMA_MODEL
                 # Let user pick a model from what's pulled
                 chosen = st.selectbox("Active model", payload,
-                                      index=payload.index(current) if current in payload else 0,
+                                      index=st.session_state["_ollama_idx"].get(settings.OLLAMA_MODEL, 0),
                                       key="model_picker")
-                if chosen != _s.OLLAMA_MODEL:
-                    _s.OLLAMA_MODEL = chosen
+                if chosen != settings.OLLAMA_MODEL:
+                    settings.OLLAMA_MODEL = chosen
         else:
             st.error(f"❌ {payload}")
             st.caption("Run `ollama serve` to start Ollama.")
+        if st.button("🔄 Refresh models", use_container_width=True):
+            _fetch_ollama_models.clear()
+            _check_ollama()
+            st.rerun()
 
     if st.session_state.db_ok is not None:
         ok, msg = st.session_state.db_ok
@@ -227,12 +421,16 @@ with st.sidebar:
             st.success(f"✅ DB connected")
         else:
             st.error(f"❌ DB: {msg}")
+        if st.button("🔄 Force recheck", use_container_width=True):
+            _cached_test_connection.clear()
+            st.session_state.db_ok = _cached_test_connection()
+            st.rerun()
 
     # Table list
     st.divider()
     st.markdown("### 📋 Available Tables")
     try:
-        tables = get_table_names()
+        tables = _cached_table_names()
         for t in tables:
             st.markdown(f"- `{t}`")
     except Exception:
@@ -248,10 +446,17 @@ with st.sidebar:
         "What is the total deal value per sales rep?",
         "Which customers are on the enterprise plan?",
     ]
-    for ex in examples:
-        if st.button(ex, key=f"ex_{ex[:20]}", use_container_width=True):
-            st.session_state["prefill"] = ex
-            st.rerun()
+    choice = st.selectbox(
+        "Try an example",
+        examples,
+        index=None,
+        placeholder="Pick a question...",
+        label_visibility="collapsed",
+        key="example_picker",
+    )
+    if st.button("Use example", use_container_width=True, disabled=choice is None):
+        # No rerun needed: the chat fragment runs later in this same pass
+        st.session_state["prefill"] = choice
 
     st.divider()
     if st.button("🗑️ Clear Chat", use_container_width=True):
@@ -269,117 +474,187 @@ st.markdown(
 )
 st.divider()
 
-# ── Chat history ──────────────────────────────────────────────────────────────
-chat_area = st.container()
+# Rows rendered per result table before "Show all" is clicked
+_PREVIEW_ROWS = 1000
 
-with chat_area:
-    if not st.session_state.messages:
-        st.markdown(
-            "<div style='text-align:center; color:#475569; padding:60px 0;'>"
-            "No messages yet. Ask a question below to get started!"
-            "</div>",
-            unsafe_allow_html=True,
+# Re-sending a question answered successfully this recently is ignored
+_DEBOUNCE_S = 5.0
+
+
+# ── Pipeline ──────────────────────────────────────────────────────────────────
+def _assistant_bubble_html(meta: dict) -> str:
+    if meta.get("error"):
+        return (
+            f'<div class="error-bubble">⚠️ {html.escape(meta["error"])}</div>'
+            '<div class="clearfix"></div>'
         )
+    return (
+        f'<div class="ai-bubble">✅ Query returned <strong>{meta.get("row_count", 0)}</strong> rows '
+        f'in <strong>{meta.get("execution_time_ms", 0):.1f}ms</strong></div>'
+        '<div class="clearfix"></div>'
+    )
 
-    for msg in st.session_state.messages:
-        role = msg["role"]
-        content = msg["content"]
-        meta = msg.get("meta", {})
-
-        if role == "user":
-            st.markdown(
-                f'<div class="user-bubble">🧑 {content}</div><div class="clearfix"></div>',
-                unsafe_allow_html=True,
+
+def _set_state(key: str, value) -> None:
+    st.session_state[key] = value
+
+
+def _render_message(msg: dict):
+    """One chat message: its bubble, plus SQL and results for assistant replies."""
+    # Bubble HTML is rendered once, when the message is appended
+    st.markdown(msg["html"], unsafe_allow_html=True)
+    if msg["role"] != "assistant":
+        return
+    meta = msg.get("meta", {})
+
+    # SQL expander
+    sql_to_show = meta.get("validated_sql") or meta.get("generated_sql")
+    if sql_to_show:
+        with st.expander("🔍 View Generated SQL", expanded=False):
+            st.code(sql_to_show, language="sql")
+
+    # Results table
+    if meta.get("data") or meta.get("rows_soa"):
+        df = _result_df(msg["id"], meta)
+        # Only ship the first rows to the browser unless asked for more
+        limit_key = f"df_limit_{msg['id']}"
+        limit = st.session_state.get(limit_key, _PREVIEW_ROWS)
+        st.dataframe(df.head(limit), use_container_width=True, hide_index=True)
+        if len(df) > limit:
+            # A callback runs before the (fragment or full-app) rerun the click
+            # triggers anyway, so no explicit st.rerun is needed
+            st.button(
+                f"Show all {len(df):,} rows",
+                key=f"show_all_{msg['id']}",
+                on_click=_set_state,
+                args=(limit_key, len(df)),
             )
+    elif meta.get("success"):
+        st.info("Query ran successfully but returned no rows.")
 
-        elif role == "assistant":
-            if meta.get("error"):
-                st.markdown(
-                    f'<div class="error-bubble">⚠️ {meta["error"]}</div>'
-                    '<div class="clearfix"></div>',
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.markdown(
-                    f'<div class="ai-bubble">✅ Query returned <strong>{meta.get("row_count", 0)}</strong> rows '
-                    f'in <strong>{meta.get("execution_time_ms", 0):.1f}ms</strong></div>'
-                    '<div class="clearfix"></div>',
-                    unsafe_allow_html=True,
-                )
-
-            # SQL expander
-            sql_to_show = meta.get("validated_sql") or meta.get("generated_sql")
-            if sql_to_show:
-                with st.expander("🔍 View Generated SQL", expanded=False):
-                    st.code(sql_to_show, language="sql")
-
-            # Results table
-            if meta.get("rows"):
-                df = pd.DataFrame(meta["rows"])
-                # Convert any non-serialisable types to string
-                for col in df.columns:
-                    if df[col].dtype == object:
-                        try:
-                            df[col] = df[col].astype(str)
-                        except Exception:
-                            pass
-                st.dataframe(df, use_container_width=True, hide_index=True)
-            elif meta.get("success"):
-                st.info("Query ran successfully but returned no rows.")
+
+def process_question(question: str, slot):
+    """
+    Answer a non-empty, stripped question and draw the exchange straight
+    into `slot` (an st.empty() below the history), so no rerun is needed.
+    """
+    messages = st.session_state.messages
+    last = messages[-1] if messages else None
+    user_msg = None
+    if last and last["role"] == "user" and last["content"] == question:
+        # A second click interrupted the run before its reply landed; answer
+        # the question already in the history instead of adding it again
+        pass
+    elif (
+        last
+        and last["role"] == "assistant"
+        and last["meta"].get("success")
+        and messages[-2]["content"] == question
+        and time.time() - last.get("answered_at", 0) < _DEBOUNCE_S
+    ):
+        # Debounce: Send pressed again right after a successful answer
+        st.toast("Already answered — see the reply above.")
+        return
+    else:
+        user_msg = {
+            "role": "user",
+            "content": question,
+            "html": f'<div class="user-bubble">🧑 {html.escape(question)}</div><div class="clearfix"></div>',
+        }
+        messages.append(user_msg)
+
+    with slot.container():
+        if user_msg:
+            _render_message(user_msg)
+
+        # Run pipeline
+        with st.spinner("🤔 Thinking..."):
+            result = _answer(question)
+
+        # Build assistant meta
+        meta = {
+            "generated_sql": result.get("generated_sql"),
+            "validated_sql": result.get("validated_sql"),
+            # Stored column-wise (aligned with "columns") for cheap DataFrame builds
+            "data": [list(col) for col in zip(*result.get("rows_soa", []))],
+            "columns": result.get("columns", []),
+            "row_count": result.get("row_count", 0),
+            "execution_time_ms": result.get("execution_time_ms", 0),
+            "success": result.get("success", False),
+            "error": result.get("error"),
+        }
+
+        assistant_msg = {
+            "id": uuid.uuid4().hex,
+            "role": "assistant",
+            "content": "",
+            "meta": meta,
+            "html": _assistant_bubble_html(meta),
+            "answered_at": time.time(),
+        }
+        messages.append(assistant_msg)
+        _render_message(assistant_msg)
 
 
 # ── Input area ────────────────────────────────────────────────────────────────
-st.divider()
+def render_input(slot):
+    st.divider()
 
-prefill = st.session_state.pop("prefill", "")
+    prefill = st.session_state.pop("prefill", "")
 
-col1, col2 = st.columns([5, 1])
-with col1:
-    user_input = st.text_input(
-        "Ask a question...",
-        value=prefill,
-        placeholder="e.g. Show me leads from Texas created in the last 7 days",
-        label_visibility="collapsed",
-        key="user_input",
-    )
-with col2:
-    send_clicked = st.button("Send ➤", use_container_width=True)
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        user_input = st.text_input(
+            "Ask a question...",
+            value=prefill,
+            placeholder="e.g. Show me leads from Texas created in the last 7 days",
+            label_visibility="collapsed",
+            key="user_input",
+        )
+    with col2:
+        send_clicked = st.button("Send ➤", use_container_width=True)
 
+    question = user_input.strip()
+    if send_clicked and question:
+        process_question(question, slot)
+    elif prefill:
+        process_question(prefill, slot)
 
-def process_question(question: str):
-    question = question.strip()
-    if not question:
-        return
 
-    # Add user message
-    st.session_state.messages.append({"role": "user", "content": question})
-
-    # Run pipeline
-    with st.spinner("🤔 Thinking..."):
-        result = handle_query(question)
-
-    # Build assistant meta
-    meta = {
-        "generated_sql": result.get("generated_sql"),
-        "validated_sql": result.get("validated_sql"),
-        "rows": result.get("rows", []),
-        "columns": result.get("columns", []),
-        "row_count": result.get("row_count", 0),
-        "execution_time_ms": result.get("execution_time_ms", 0),
-        "success": result.get("success", False),
-        "error": result.get("error"),
-    }
-
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": "",
-        "meta": meta,
-    })
-
-    st.rerun()
-
-
-if send_clicked and user_input:
-    process_question(user_input)
-elif prefill:
-    process_question(prefill)
+# ── Chat history ──────────────────────────────────────────────────────────────
+@st.fragment
+def render_chat():
+    """
+    Chat history plus the input row. As a fragment, typing and sending only
+    rerun this block, not the sidebar (DB table list, Ollama panel, ...).
+    A new exchange is drawn into the slot between history and input.
+    """
+    for msg in st.session_state.messages:
+        _render_message(msg)
+
+    slot = st.empty()
+    if not st.session_state.messages:
+        slot.markdown(
+            "<div style='text-align:center; color:#475569; padding:60px 0;'>"
+            "No messages yet. Ask a question below to get started!"
+            "</div>",
+            unsafe_allow_html=True,
+        )
+
+    render_input(slot)
+
+
+# The sidebar above is already on screen; only the chat waits for the DB
+if st.session_state.db_ok is None:
+    with st.spinner("Connecting to the database..."):
+        st.session_state.db_ok = _cached_test_connection()
+
+db_ok, db_msg = st.session_state.db_ok
+if db_ok:
+    render_chat()
+else:
+    st.error(f"❌ Database unavailable: {db_msg}")
+    if st.button("🔄 Retry connection"):
+        _cached_test_connection.clear()
+        st.session_state.db_ok = None
+        st.rerun()